@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -76,7 +77,9 @@ WSGI_APPLICATION = "ArabicLexia.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("ARABICLEXIA_DB_PATH", BASE_DIR / "db.sqlite3"),
+        # IMMEDIATE يمنع فشل "database is locked" الفوري عند تزامن الكتابة من الطلبات وخيوط التحليل الخلفية
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
 
@@ -124,4 +127,29 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Media files (user-uploaded content)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = os.environ.get('ARABICLEXIA_MEDIA_ROOT', BASE_DIR / 'media')
+# Font analysis
+# تقليص الخط في الذاكرة إلى النطاقات العربية/اللاتينية قبل التحليل
+FONT_ANALYSIS_SUBSET = False
+
+# حدود عمليات التحليل المعزولة (تُعاد العمليات للاستخدام بين الخطوط)
+FONT_ANALYSIS_SANDBOX = {
+    'ENABLED': True,
+    'WORKERS': 2,
+    'CPU_SECONDS': 60,
+    'WALL_SECONDS': 120,
+    'MEMORY_MB': 1024,
+}
+
+# ميزانية زمن الإقلاع (بالثواني) التي يتحقق منها الأمر check_import_time
+IMPORT_TIME_BUDGET_SECONDS = 1.0
+
+# تشغيل التحليل الكامل في خيط خلفي بعد حفظ نتائج الفحص السريع
+FONT_ANALYSIS_DEEP_IN_BACKGROUND = True
+
+# ذاكرة الخطوط المحللة في كل عملية تحليل (عدد الخطوط وحجمها المقاس في الذاكرة بعد فك جداولها)
+# MAX_MB=None يشتقها من MEMORY_MB أعلاه، والقيمة الأكبر من حصتها تُقلّص إليها
+FONT_ANALYSIS_CACHE = {
+    'MAX_ENTRIES': 8,
+    'MAX_MB': None,
+}
@@ -1,45 +1,139 @@
 # fonts/admin.py
 # (This is the full, final version from the previous step which is correct)
 from django.contrib import admin
-from .models import Font, Criterion, AnalysisResult
-from .analyzer import FontAnalyzer
+from .models import Font, Criterion, AnalysisResult, AnalysisJob
+from .sandbox import cache_stats, deep_workers, get_limits, run_analysis
 from django.conf import settings
+from django.utils import timezone
+from django.db import connection, transaction
 from django.core.files import File
 import os
+import logging
+import threading
 import traceback
-from django.utils.html import format_html
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.utils.html import format_html, format_html_join
+from django.db import models
 import csv
 
+logger = logging.getLogger(__name__)
+
+_deep_executor = None
+_deep_executor_lock = threading.Lock()
+
+def _get_deep_executor():
+    # خيوط التحليل الكامل أقل من عمليات العزل بواحدة حتى يبقى للفحص السريع مكان، وما زاد ينتظر في الطابور
+    global _deep_executor
+    with _deep_executor_lock:
+        if _deep_executor is None:
+            _deep_executor = ThreadPoolExecutor(max_workers=deep_workers(get_limits()['WORKERS']), thread_name_prefix='deep-analysis')
+        return _deep_executor
+
+def _fail_interrupted_jobs():
+    """Marks jobs still 'queued' or 'running' well past the sandbox wall-clock limit as failed; their process died with them."""
+    cutoff = timezone.now() - timedelta(seconds=2 * get_limits()['WALL_SECONDS'])
+    # started_at للمهمة المنتظرة هو وقت إنشائها، فالحد نفسه يلتقط ما بقي في طابور عملية توقفت
+    AnalysisJob.objects.filter(status__in=['queued', 'running'], started_at__lt=cutoff).update(
+        status='failed', reason="انقطع التحليل قبل انتهائه (أُعيد تشغيل العملية أو توقفت)", finished_at=timezone.now())
+
 @admin.register(Font)
 class FontAdmin(admin.ModelAdmin):
-    list_display = ('font_name', 'designer', 'classification', 'language_support', 'upload_date')
+    list_display = ('font_name', 'designer', 'classification', 'language_support', 'previous_version', 'upload_date')
     actions = ['reanalyze_fonts']
+    readonly_fields = ('full_font_name', 'version_delta_report')
     def _perform_analysis(self, request, font_obj):
+        font_obj.font_file.open('rb'); font_obj.font_file.seek(0)
+        font_data = font_obj.font_file.read()
         font_obj.font_file.seek(0)
-        analyzer = FontAnalyzer(font_obj.font_file, font_obj.font_type, font_obj.language_support)
-        analysis_data = analyzer.analyze()
-        font_obj.font_file.seek(0)
-        fields_to_clear = {field.name: None for field in AnalysisResult._meta.fields if field.name not in ['font', 'font_id']}
-        result_obj, _ = AnalysisResult.objects.update_or_create(font=font_obj, defaults=fields_to_clear)
-        for key, value in analysis_data.items():
-            if hasattr(result_obj, key): setattr(result_obj, key, value)
-        
-        # Final Score calculation can be re-enabled here
-        
-        result_obj.save()
+        _fail_interrupted_jobs()
+        # الفحص السريع يُحفظ فوراً، ثم يكمل التحليل الكامل بقية المقاييس
+        quick_data = self._run_tier(font_obj, font_data, 'quick')
+        self._link_previous_version(font_obj, quick_data.get('full_font_name'))
+        if getattr(settings, 'FONT_ANALYSIS_DEEP_IN_BACKGROUND', True):
+            # تحليل كامل لم يبدأ بعد لنسخة سابقة من الخط لم تعد له فائدة
+            AnalysisJob.objects.filter(font=font_obj, tier='deep', status='queued').update(
+                status='failed', reason="استُبدل بتحليل أحدث للخط", finished_at=timezone.now())
+            job = AnalysisJob.objects.create(font=font_obj, tier='deep', status='queued')
+            # يبدأ بعد حفظ المعاملة حتى يرى الخيط الخط وملفه ونتيجة الفحص السريع
+            transaction.on_commit(lambda: _get_deep_executor().submit(self._run_deep_tier_in_background, font_obj, font_data, job.pk))
+        else:
+            self._run_tier(font_obj, font_data, 'deep')
+    def _run_tier(self, font_obj, font_data, tier, job=None):
+        if job is None: job = AnalysisJob.objects.create(font=font_obj, tier=tier)
+        try:
+            analysis_data = run_analysis(font_data, font_obj.font_type, font_obj.language_support,
+                                         subset=getattr(settings, 'FONT_ANALYSIS_SUBSET', False), tier=tier,
+                                         previous=self._previous_version_data(font_obj) if tier == 'deep' else None)
+            if tier == 'deep':
+                fields_to_clear = {field.name: None for field in AnalysisResult._meta.fields if field.name not in ['font', 'font_id']}
+                result_obj, _ = AnalysisResult.objects.update_or_create(font=font_obj, defaults=fields_to_clear)
+            else:
+                # الفحص السريع يحدّث مقاييسه فقط، ويبقى التحليل الكامل السابق كما هو حتى يحل محله التحليل الجديد؛
+                # فكل ما يحسبه الفحص السريع يعيد التحليل الكامل حسابه بدقة أكبر، ولا تختلط قيم المستويين
+                result_obj, _ = AnalysisResult.objects.get_or_create(font=font_obj)
+            stored = analysis_data if tier == 'deep' or result_obj.analysis_tier != 'deep' else {}
+            for key, value in stored.items():
+                if hasattr(result_obj, key): setattr(result_obj, key, value)
+            if tier == 'deep' or result_obj.analysis_tier is None: result_obj.analysis_tier = tier
+            
+            # Final Score calculation can be re-enabled here
+            
+            result_obj.save()
+        except Exception as e:
+            job.status, job.reason, job.finished_at = 'failed', str(e), timezone.now(); job.save()
+            raise
+        job.status, job.finished_at = 'succeeded', timezone.now(); job.save()
+        return analysis_data
+    def _link_previous_version(self, font_obj, full_font_name):
+        # يُربط الخط تلقائياً بآخر خط مرفوع يحمل الاسم الكامل نفسه في جدول name
+        if not full_font_name: return
+        font_obj.full_font_name = full_font_name
+        if font_obj.previous_version_id is None:
+            font_obj.previous_version = Font.objects.filter(full_font_name=full_font_name, pk__lt=font_obj.pk).order_by('-pk').first()
+        font_obj.save(update_fields=['full_font_name', 'previous_version'])
+    def _previous_version_data(self, font_obj):
+        result = AnalysisResult.objects.filter(font_id=font_obj.previous_version_id).values('glyph_data', 'table_hashes').first()
+        return result if result and result['glyph_data'] else None
+    @admin.display(description="مقارنة المقاييس بالإصدار السابق")
+    def version_delta_report(self, obj):
+        current = AnalysisResult.objects.filter(font=obj).first()
+        previous = AnalysisResult.objects.filter(font_id=obj.previous_version_id).first() if obj.previous_version_id else None
+        if not current or not previous: return "-"
+        rows = []
+        for field in AnalysisResult._meta.fields:
+            if not isinstance(field, (models.FloatField, models.IntegerField)): continue
+            old, new = getattr(previous, field.name), getattr(current, field.name)
+            if old is None and new is None: continue
+            delta = f"{new - old:+.4g}" if old is not None and new is not None else "-"
+            rows.append((field.verbose_name, "-" if old is None else f"{old:.4g}", "-" if new is None else f"{new:.4g}", delta))
+        diff = current.version_diff or {}
+        summary = format_html("الجداول المتغيرة: {} | رسوم متغيرة: {} | مضافة: {} | محذوفة: {} | معاد استخدامها: {}",
+                              ", ".join(diff.get('changed_tables', [])) or "-", diff.get('changed_glyphs', "-"),
+                              diff.get('added_glyphs', "-"), diff.get('removed_glyphs', "-"), diff.get('reused_glyphs', "-"))
+        table = format_html_join("", "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>", rows)
+        return format_html("<p>{}</p><table><tr><th>المقياس</th><th>{}</th><th>{}</th><th>الفرق</th></tr>{}</table>",
+                           summary, obj.previous_version, obj, table)
+    def _run_deep_tier_in_background(self, font_obj, font_data, job_id):
+        try:
+            # لا يبدأ إلا إذا بقيت المهمة في الانتظار، فالمستبدلة بتحليل أحدث تُترك
+            if AnalysisJob.objects.filter(pk=job_id, status='queued').update(status='running', started_at=timezone.now()):
+                self._run_tier(font_obj, font_data, 'deep', AnalysisJob.objects.get(pk=job_id))
+        except Exception: logger.exception("Deep analysis failed for font %s", font_obj.pk)
+        finally: connection.close()
     @admin.action(description="إعادة تحليل الخطوط المحددة")
     def reanalyze_fonts(self, request, queryset):
         for font in queryset:
             try:
                 self._perform_analysis(request, font)
-                self.message_user(request, f"تمت إعادة تحليل الخط: {font.font_name}")
+                self.message_user(request, f"تم الفحص السريع للخط: {font.font_name}، والتحليل الكامل قيد التنفيذ")
             except Exception as e:
                 self._message_user_with_traceback(request, font.font_name, e)
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
         try:
             self._perform_analysis(request, obj)
-            self.message_user(request, "تم حفظ وتحليل الخط بنجاح.")
+            self.message_user(request, "تم حفظ الخط وفحصه سريعاً، والتحليل الكامل قيد التنفيذ.")
         except Exception as e:
             self._message_user_with_traceback(request, obj.font_name, e)
     def _message_user_with_traceback(self, request, font_name, e):
@@ -50,7 +144,15 @@ class FontAdmin(admin.ModelAdmin):
 class CriterionAdmin(admin.ModelAdmin):
     list_display = ('criterion_name', 'metric_key', 'ideal_value', 'weight', 'language_scope', 'lower_is_better')
 
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('font', 'tier', 'status', 'reason', 'started_at', 'finished_at')
+    list_filter = ('status', 'tier')
+    def changelist_view(self, request, extra_context=None):
+        # إحصاءات ذاكرة الخطوط في عمليات التحليل الخاملة التابعة لهذه العملية
+        return super().changelist_view(request, {**(extra_context or {}), 'cache_stats': cache_stats()})
+
 @admin.register(AnalysisResult)
 class AnalysisResultAdmin(admin.ModelAdmin):
     def get_list_display(self, request):
-        return [field.name for field in self.model._meta.fields]
\ No newline at end of file
+        return [field.name for field in self.model._meta.fields if not isinstance(field, models.JSONField)]
\ No newline at end of file
@@ -1,36 +1,74 @@
 # fonts/analyzer.py
-from fontTools.ttLib import TTFont
-import matplotlib.pyplot as plt
 import os
 from .metrics.base_dimensions import calculate_base_dimensions
 from .metrics.consistency import calculate_consistency_metrics
 from .metrics.special_metrics import calculate_special_metrics
 from .metrics.positional_consistency import calculate_positional_consistency
 from .metrics.utils import get_glyph_bbox
+from .glyph_selection import select_glyphs
+from .font_cache import FontHandle
+from .version_diff import glyph_hashes, table_hashes, summarize
 
 class FontAnalyzer:
-    def __init__(self, font_path, font_type, language_support):
-        self.font = TTFont(font_path)
+    def __init__(self, font_path, font_type, language_support, subset=False, lazy=None, handle=None, previous=None):
+        # handle يأتي من ذاكرة الخطوط المحللة عند إعادة تحليل الخط نفسه
+        self.handle = handle or FontHandle.load(font_path, lazy=lazy, subset_scope=language_support if subset else None)
+        self.font = self.handle.font
         self.font_type = font_type
         self.language_support = language_support
         self.metrics = {}
-        self.glyph_set = self.font.getGlyphSet()
-        self.cmap = self.font.getBestCmap()
+        # previous: glyph_data وtable_hashes المحفوظة لنتيجة الإصدار السابق من الخط نفسه
+        self.previous = previous or {}
+        self.glyph_data = {}
+        self.reused_glyphs = 0
+        self.cmap = self.handle.cmap
         self.hmtx = self.font['hmtx']
-        self.raw_data = {'widths': [], 'lsbs': [], 'rsbs': []}
+        self.raw_data = {'widths': [], 'lsbs': [], 'rsbs': [], 'v_centers': [],
+                         'arabic_ascenders': [], 'arabic_descenders': [], 'latin_ascenders': [], 'latin_descenders': []}
 
-    def _gather_base_data(self):
+    @property
+    def glyph_set(self):
+        # يُبنى عند أول حاجة إلى الرسوم فقط، فلا يلمسه الفحص السريع
+        return self.handle.glyph_set
+
+    def _gather_base_data(self, outlines=True):
         if not self.cmap: return
-        for glyph_name in self.cmap.values():
-            if not isinstance(glyph_name, str) or glyph_name == ".notdef": continue
-            try:
-                advance_width, lsb = self.hmtx[glyph_name]
-                if advance_width == 0: continue
-                self.raw_data['widths'].append(advance_width)
-                self.raw_data['lsbs'].append(lsb)
-                bbox = get_glyph_bbox(self.glyph_set, glyph_name)
-                if bbox: self.raw_data['rsbs'].append(advance_width - lsb - (bbox[2] - bbox[0]))
-            except Exception: continue
+        selected = select_glyphs(self.cmap, self.language_support)
+        if outlines:
+            hashes = glyph_hashes(self.font, [name for names in selected.values() for name in names])
+            previous_glyphs = self.previous.get('glyph_data') or {}
+        for script, glyph_names in selected.items():
+            for glyph_name in glyph_names:
+                try:
+                    if not outlines:
+                        advance_width, lsb = self.hmtx[glyph_name]
+                        if advance_width == 0: continue
+                        self.raw_data['widths'].append(advance_width)
+                        self.raw_data['lsbs'].append(lsb)
+                        continue
+                    # الرسوم التي لم تتغير بصمتها منذ الإصدار السابق تُعاد بياناتها دون إعادة رسمها
+                    record = previous_glyphs.get(glyph_name)
+                    if record and record.get('hash') == hashes[glyph_name]: self.reused_glyphs += 1
+                    else: record = self._measure_glyph(glyph_name, hashes[glyph_name])
+                    self.glyph_data[glyph_name] = record
+                    self._accumulate(script, record)
+                except Exception: continue
+
+    def _measure_glyph(self, glyph_name, glyph_hash):
+        advance_width, lsb = self.hmtx[glyph_name]
+        bbox = get_glyph_bbox(self.glyph_set, glyph_name) if advance_width else None
+        return {'hash': glyph_hash, 'width': advance_width, 'lsb': lsb, 'bbox': list(bbox) if bbox else None}
+
+    def _accumulate(self, script, record):
+        advance_width, lsb, bbox = record['width'], record['lsb'], record['bbox']
+        if advance_width == 0: return
+        self.raw_data['widths'].append(advance_width)
+        self.raw_data['lsbs'].append(lsb)
+        if not bbox: return
+        self.raw_data['rsbs'].append(advance_width - lsb - (bbox[2] - bbox[0]))
+        self.raw_data['v_centers'].append((bbox[1] + bbox[3]) / 2)
+        if bbox[3] > 0: self.raw_data[f'{script}_ascenders'].append(bbox[3])
+        if bbox[1] < 0: self.raw_data[f'{script}_descenders'].append(bbox[1])
 
     def analyze(self):
         self._gather_base_data()
@@ -40,11 +78,35 @@ class FontAnalyzer:
         self.metrics.update(calculate_special_metrics(self))
         if self.language_support != 'latin_only':
             self.metrics.update(calculate_positional_consistency(self))
+        self.metrics['glyph_data'] = self.glyph_data
+        self.metrics['table_hashes'] = table_hashes(self.font)
+        if self.previous:
+            self.metrics['version_diff'] = summarize(self.previous, self.metrics['table_hashes'], self.glyph_data, self.reused_glyphs)
+        return self._finalize_metrics()
+
+    def quick_scan(self):
+        """Cheap tier: reads only hhea, OS/2, hmtx, cmap and GPOS, without drawing outlines or shaping."""
+        self._gather_base_data(outlines=False)
+        self.metrics.update(calculate_base_dimensions(self, outlines=False))
+        self.metrics.update(calculate_special_metrics(self))
+        if 'name' in self.font: self.metrics['full_font_name'] = self._full_font_name()
+        return self._finalize_metrics()
+
+    def _full_font_name(self):
+        # المعرّف 4 أولاً، وإن غاب يُركّب من اسم العائلة والنمط (16/17 ثم 1/2)
+        name = self.font['name']
+        full_name = name.getDebugName(4)
+        if full_name: return full_name
+        family, style = name.getDebugName(16) or name.getDebugName(1), name.getDebugName(17) or name.getDebugName(2)
+        return " ".join(part for part in (family, style) if part) or None
+
+    def _finalize_metrics(self):
         kerning_val = self.metrics.pop('kerning_quality', 0)
         self.metrics['arabic_kerning_quality'] = kerning_val
         self.metrics['latin_kerning_quality'] = kerning_val
         return {k: v for k, v in self.metrics.items() if v is not None}
     
     def generate_width_histogram(self, output_dir, font_id, font_name):
+        import matplotlib.pyplot as plt  # يُحمّل عند أول استخدام فقط لأنه ثقيل
         # ... (الكود هنا لم يتغير) ...
         pass
\ No newline at end of file
@@ -0,0 +1,133 @@
+# fonts/font_cache.py
+# ذاكرة LRU لكل عملية تحتفظ بالخطوط المحللة (TTFont وcmap ووجه HarfBuzz) مفهرسة ببصمة محتوى الملف
+import gc
+import hashlib
+import io
+import sys
+import threading
+import types
+from collections import OrderedDict
+from functools import cached_property
+from fontTools.ttLib import TTFont
+from .glyph_selection import subset_font
+
+# كائنات مشتركة بين كل الخطوط لا تُحسب على أي منها
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def _deep_size(root):
+    """Bytes held by every object reachable from root, each counted once."""
+    seen, stack, total = set(), [root], 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES): continue
+        seen.add(id(obj)); total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+# حجم الخط في الذاكرة بعد فك جداوله أضعاف حجم ملفه (نحو 20 ضعفاً لخطوط Noto العربية وArial)
+ESTIMATED_SIZE_FACTOR = 20
+
+class FontHandle:
+    """Parsed, read-only font objects shared by every analysis of the same file bytes."""
+    def __init__(self, data, lazy=None):
+        self.data = data
+        self.font = TTFont(io.BytesIO(data), lazy=lazy)
+        self.cmap = self.font.getBestCmap()
+        self.lock = threading.RLock()
+        # تقدير أولي من حجم الملف حتى يُقاس المقبض فعلياً بعد أول تحليل كامل
+        self.size = len(data) * ESTIMATED_SIZE_FACTOR
+        self.settled = False
+
+    @classmethod
+    def load(cls, font_path, lazy=None, subset_scope=None):
+        if isinstance(font_path, (bytes, bytearray)): data = bytes(font_path)
+        elif hasattr(font_path, 'read'):
+            data = font_path.read(); font_path.seek(0)
+        else:
+            with open(font_path, 'rb') as f: data = f.read()
+        if subset_scope: data = subset_font(TTFont(io.BytesIO(data)), subset_scope)
+        return cls(data, lazy=lazy)
+
+    def measure(self):
+        """Sets size to the memory the handle really holds: file bytes, decompiled tables and cached objects."""
+        self.size = _deep_size(self)
+        return self.size
+
+    @cached_property
+    def glyph_set(self):
+        return self.font.getGlyphSet()
+
+    @cached_property
+    def form_index(self):
+        from .metrics.form_index import build_form_index
+        return build_form_index(self.font, self.cmap)
+
+    @cached_property
+    def hb_font(self):
+        import uharfbuzz as hb
+        face = hb.Face(self.data); font = hb.Font(face); font.scale = (face.upem, face.upem); hb.ot_font_set_funcs(font)
+        return font
+
+class FontCache:
+    """Bounded LRU of FontHandle objects, limited by entry count and by the measured memory of the cached handles."""
+    def __init__(self, max_entries=8, max_mb=256):
+        self.max_entries, self.max_bytes = max_entries, int(max_mb * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, font_data, subset_scope=None):
+        # الفحص السريع والتحليل الكامل يتشاركان المقبض نفسه، لذا لا يدخل نمط التحميل في المفتاح
+        if not self.max_entries:
+            self.misses += 1
+            return FontHandle.load(font_data, lazy=True, subset_scope=subset_scope)
+        key = (hashlib.sha256(font_data).hexdigest(), subset_scope)
+        with self.lock:
+            handle = self.entries.get(key)
+            if handle is not None:
+                self.entries.move_to_end(key); self.hits += 1
+                return handle
+            self.misses += 1
+        # التحميل كسول حتى يبقى الفحص السريع رخيصاً، ويُقاس الحجم الفعلي في resize بعد أول تحليل كامل
+        handle = FontHandle.load(font_data, lazy=True, subset_scope=subset_scope)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = handle; self.total_bytes += handle.size
+                self._evict()
+        return handle
+
+    def resize(self, handle):
+        """Re-measures a cached handle after an analysis grew it (expanded glyphs, form index) and evicts to fit."""
+        old_size = handle.size
+        handle.measure(); handle.settled = True
+        with self.lock:
+            if any(entry is handle for entry in self.entries.values()):
+                self.total_bytes += handle.size - old_size
+                self._evict()
+
+    def _evict(self):
+        # يُبقى على أحدث عنصر دائماً حتى لو تجاوز وحده الحد
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, handle = self.entries.popitem(last=False)
+            self.total_bytes -= handle.size; self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear(); self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self.entries), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+_cache = None
+
+def configure(max_entries=8, max_mb=256):
+    global _cache
+    _cache = FontCache(max_entries, max_mb)
+    return _cache
+
+def get_cache():
+    return _cache if _cache is not None else configure()
@@ -0,0 +1,55 @@
+# fonts/glyph_selection.py
+import io
+
+# كتل الحروف العربية (الأساسية والملحق والممتد أ وب) وكتل أشكال العرض، ويستعملها فهرس الأشكال الموضعية أيضاً
+ARABIC_BLOCKS = [(0x0600, 0x06FF), (0x0750, 0x077F), (0x0870, 0x089F), (0x08A0, 0x08FF)]
+PRESENTATION_BLOCKS = [(0xFB50, 0xFDFF), (0xFE70, 0xFEFF)]
+
+# نطاقات يونيكود لكل نص كتابي
+SCRIPT_RANGES = {
+    'arabic': ARABIC_BLOCKS + PRESENTATION_BLOCKS,
+    'latin': [(0x0020, 0x007E)],
+}
+LANGUAGE_SCRIPTS = {
+    'arabic_only': ('arabic',),
+    'latin_only': ('latin',),
+    'bilingual': ('arabic', 'latin'),
+}
+
+def scripts_for(language_support):
+    return LANGUAGE_SCRIPTS.get(language_support, ('arabic', 'latin'))
+
+def in_script(codepoint, script):
+    return any(start <= codepoint <= end for start, end in SCRIPT_RANGES[script])
+
+# المسافة تُبقى دائماً لأن نسبة عرض الفراغ تُقاس لكل الخطوط
+ALWAYS_KEPT = {0x0020}
+
+def select_codepoints(cmap, language_support):
+    scripts = scripts_for(language_support)
+    return sorted(cp for cp in (cmap or {}) if cp in ALWAYS_KEPT or any(in_script(cp, s) for s in scripts))
+
+def select_glyphs(cmap, language_support):
+    """Returns {script: [glyph_name, ...]} with every glyph listed once, even when several codepoints map to it."""
+    selected = {script: [] for script in scripts_for(language_support)}
+    seen = {'.notdef'}
+    for codepoint in sorted(cmap or {}):
+        glyph_name = cmap[codepoint]
+        if not isinstance(glyph_name, str) or glyph_name in seen: continue
+        for script in selected:
+            if in_script(codepoint, script):
+                selected[script].append(glyph_name); seen.add(glyph_name)
+                break
+    return selected
+
+def subset_font(font, language_support):
+    """Subsets the font in memory to the scripts implied by language_support and returns the compiled subset bytes."""
+    from fontTools import subset
+    options = subset.Options()
+    options.layout_features = ['*']; options.name_IDs = ['*']; options.glyph_names = True
+    options.notdef_glyph = True; options.notdef_outline = True; options.legacy_kern = True; options.hinting = False
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(unicodes=select_codepoints(font.getBestCmap(), language_support))
+    subsetter.subset(font)
+    buffer = io.BytesIO(); font.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,156 @@
+# fonts/loadtest.py
+# أدوات اختبار الحمل: توليد خطوط اصطناعية، وعميل HTTP للوحة التحكم، وتجميع زمن الاستجابة
+import http.cookiejar
+import io
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+LATIN_CHARS = [chr(c) for c in range(0x41, 0x5B)] + [chr(c) for c in range(0x61, 0x7B)]
+ARABIC_CHARS = [chr(c) for c in range(0x0627, 0x064A + 1) if 0x063B > c or c > 0x0640]
+JOINING_FORMS = ('init', 'medi', 'fina')
+# رسائل الخطأ في صفحات لوحة التحكم: رسائل الإجراءات وأخطاء النماذج
+ERROR_MARKERS = re.compile(rb'class="(?:error|errornote|errorlist)[" ]')
+
+def _box_glyph(width, height, depth):
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+    pen = TTGlyphPen(None)
+    pen.moveTo((50, -depth)); pen.lineTo((50, height)); pen.lineTo((width - 50, height)); pen.lineTo((width - 50, -depth)); pen.closePath()
+    return pen.glyph()
+
+def generate_font(family_name, seed=None):
+    """Builds a small bilingual TrueType font with random box outlines and GSUB positional forms."""
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+    rng = random.Random(seed)
+    cmap = {0x20: 'space'}
+    cmap.update({ord(c): f'uni{ord(c):04X}' for c in LATIN_CHARS + ARABIC_CHARS})
+    arabic_names = [f'uni{ord(c):04X}' for c in ARABIC_CHARS]
+    glyph_order = ['.notdef'] + sorted(cmap.values()) + [f'{name}.{form}' for name in arabic_names for form in JOINING_FORMS]
+    glyphs, metrics = {}, {}
+    for name in glyph_order:
+        if name == 'space':
+            glyphs[name] = TTGlyphPen(None).glyph(); metrics[name] = (300, 0); continue
+        width = rng.randint(350, 900)
+        glyphs[name] = _box_glyph(width, rng.randint(400, 750), rng.choice([0, 0, rng.randint(50, 250)]))
+        metrics[name] = (width, 50)
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(glyph_order); builder.setupCharacterMap(cmap)
+    builder.setupGlyf(glyphs); builder.setupHorizontalMetrics(metrics)
+    builder.setupHorizontalHeader(ascent=800, descent=-250)
+    builder.setupNameTable({'familyName': family_name, 'styleName': 'Regular'})
+    builder.setupOS2(sTypoAscender=800, sTypoDescender=-250, usWinAscent=800, usWinDescent=250, sxHeight=500, sCapHeight=700)
+    builder.setupPost()
+    features = "languagesystem arab dflt;\n" + "".join(
+        f"feature {form} {{ {' '.join(f'sub {name} by {name}.{form};' for name in arabic_names)} }} {form};\n" for form in JOINING_FORMS)
+    addOpenTypeFeaturesFromString(builder.font, features)
+    buffer = io.BytesIO(); builder.font.save(buffer)
+    return buffer.getvalue()
+
+def percentile(sorted_values, fraction):
+    if not sorted_values: return None
+    # nearest-rank
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+class FormRejected(Exception):
+    """Raised when an admin form POST is answered without a redirect, i.e. the form was re-rendered with errors."""
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs): return None
+
+class AdminClient:
+    """One logged-in admin session; redirects are handled explicitly so a POST and its result page are timed together."""
+    def __init__(self, base_url, username, password, timeout=300):
+        self.base_url, self.timeout, self.last_location = base_url.rstrip('/'), timeout, None
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.get('/admin/login/')
+        status, _ = self.post('/admin/login/', {'username': username, 'password': password, 'next': '/admin/'})
+        if status != 302: raise RuntimeError(f"admin login failed (HTTP {status})")
+
+    def _csrf(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response: return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            self.last_location = e.headers.get('Location')
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, fields, files=None):
+        headers = {'X-CSRFToken': self._csrf(), 'Referer': self.base_url + path}
+        fields = {'csrfmiddlewaretoken': self._csrf(), **fields}
+        if files:
+            boundary = uuid.uuid4().hex; body = io.BytesIO()
+            for name, value in fields.items():
+                values = value if isinstance(value, list) else [value]
+                for item in values: body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{item}\r\n'.encode())
+            for name, (filename, content) in files.items():
+                body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                           f'Content-Type: font/ttf\r\n\r\n'.encode() + content + b'\r\n')
+            body.write(f'--{boundary}--\r\n'.encode())
+            data, headers['Content-Type'] = body.getvalue(), f'multipart/form-data; boundary={boundary}'
+        else:
+            data = urllib.parse.urlencode(fields, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        return self._open(urllib.request.Request(self.base_url + path, data=data, headers=headers))
+
+    def post_and_follow(self, path, fields, files=None):
+        """POSTs an admin form and loads the page it redirects to, where the admin shows success or error messages."""
+        status, body = self.post(path, fields, files)
+        # لوحة التحكم تعيد عرض النموذج برمز 200 عند فشل التحقق، فلا يُقبل إلا إعادة التوجيه
+        if status != 302: raise FormRejected(f"{path} was not accepted (HTTP {status})")
+        return self.get(urllib.parse.urlsplit(self.last_location).path)
+
+    def upload_font(self, font_name, font_data):
+        return self.post_and_follow('/admin/fonts/font/add/', {'font_name': font_name, 'font_type': 'sans-serif',
+                                                    'language_support': 'bilingual', 'classification': 'standard'},
+                         files={'font_file': (f'{font_name}.ttf', font_data)})
+
+    def reanalyze(self, font_ids):
+        return self.post_and_follow('/admin/fonts/font/', {'action': 'reanalyze_fonts', '_selected_action': [str(i) for i in font_ids], 'index': '0'})
+
+    def font_ids(self):
+        _, body = self.get('/admin/fonts/font/')
+        return [int(i) for i in re.findall(rb'name="_selected_action" value="(\d+)"', body)]
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples, self.errors, self.lock = {}, {}, threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + (0 if ok else 1)
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in self.samples.items():
+            ordered = sorted(samples)
+            endpoints[endpoint] = {
+                'requests': len(ordered), 'errors': self.errors[endpoint], 'error_rate': self.errors[endpoint] / len(ordered),
+                'throughput_rps': len(ordered) / elapsed if elapsed else None,
+                'p50_ms': percentile(ordered, 0.50) * 1000, 'p95_ms': percentile(ordered, 0.95) * 1000,
+                'p99_ms': percentile(ordered, 0.99) * 1000, 'max_ms': ordered[-1] * 1000,
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        return {'elapsed_seconds': elapsed, 'total_requests': total, 'throughput_rps': total / elapsed if elapsed else None,
+                'endpoints': endpoints}
+
+def timed(recorder, endpoint, call):
+    start = time.perf_counter()
+    # يُعدّ الطلب فاشلاً إذا لم يُعِد التوجيه (FormRejected) أو عرضت لوحة التحكم رسالة خطأ بعده
+    try: status, body = call(); ok = status == 200 and not ERROR_MARKERS.search(body)
+    except Exception: ok = False
+    recorder.record(endpoint, time.perf_counter() - start, ok)
@@ -0,0 +1,39 @@
+# fonts/management/commands/check_import_time.py
+import json
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ['matplotlib', 'fontTools', 'uharfbuzz', 'numpy']
+PROBE = """
+import json, os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", %r)
+start = time.perf_counter()
+import django; django.setup()
+import fonts.admin
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+class Command(BaseCommand):
+    help = "يقيس زمن إقلاع Django مع تطبيق fonts ويفشل عند تجاوز الميزانية أو تحميل وحدات التحليل الثقيلة"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=getattr(settings, 'IMPORT_TIME_BUDGET_SECONDS', 1.0))
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        probe = PROBE % (settings.SETTINGS_MODULE, HEAVY_MODULES)
+        samples, heavy = [], set()
+        for _ in range(options['runs']):
+            # كل قياس في عملية جديدة حتى لا تؤثر الوحدات المحمّلة مسبقاً على النتيجة
+            output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, cwd=settings.BASE_DIR)
+            if output.returncode != 0: raise CommandError(output.stderr)
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            samples.append(result['seconds']); heavy.update(result['heavy'])
+        best = min(samples)
+        self.stdout.write(f"import time: best {best:.3f}s, worst {max(samples):.3f}s over {len(samples)} runs (budget {options['budget']:.3f}s)")
+        if heavy: raise CommandError(f"heavy modules loaded at startup: {', '.join(sorted(heavy))}")
+        if best > options['budget']: raise CommandError(f"startup took {best:.3f}s, over the {options['budget']:.3f}s budget")
+        self.stdout.write(self.style.SUCCESS("import time within budget"))
@@ -0,0 +1,143 @@
+# fonts/management/commands/loadtest.py
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from fonts.loadtest import AdminClient, FormRejected, LatencyRecorder, generate_font, timed
+
+USERNAME, PASSWORD = 'loadtest', 'loadtest-password'
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0)); return sock.getsockname()[1]
+
+class Command(BaseCommand):
+    help = "اختبار حمل محلي لمسار رفع الخطوط وإعادة تحليلها مع تقرير للإنتاجية وزمن الاستجابة ونسبة الأخطاء"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['runserver', 'gunicorn'], default='runserver')
+        parser.add_argument('--server-workers', type=int, default=2, help="عدد عمليات gunicorn")
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=40)
+        parser.add_argument('--upload-ratio', type=float, default=0.5, help="نسبة طلبات الرفع، والباقي إعادة تحليل")
+        parser.add_argument('--seed-fonts', type=int, default=3, help="خطوط تُرفع قبل القياس لتتوفر لإعادة التحليل")
+        parser.add_argument('--drain-timeout', type=float, default=300, help="مهلة انتظار انتهاء التحليل الكامل في الخلفية")
+        parser.add_argument('--output', default='loadtest_report.json')
+        parser.add_argument('--keep-workdir', action='store_true')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='arabiclexia-loadtest-')
+        env = {**os.environ, 'ARABICLEXIA_DB_PATH': os.path.join(workdir, 'db.sqlite3'),
+               'ARABICLEXIA_MEDIA_ROOT': os.path.join(workdir, 'media'), 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        server = None
+        try:
+            # قاعدة بيانات جديدة فارغة ينشئها migrate في المجلد المؤقت، فلا يقرأ الاختبار البيانات الحقيقية ولا يلوثها
+            self._manage(env, 'migrate', '--noinput', '-v0')
+            self._manage(env, 'shell', '-c', "from django.contrib.auth.models import User; "
+                         f"User.objects.create_superuser({USERNAME!r}, '', {PASSWORD!r})")
+            port = _free_port(); base_url = f'http://127.0.0.1:{port}'
+            server = self._start_server(options, env, port, os.path.join(workdir, 'server.log'))
+            self._wait_until_ready(server, base_url)
+            started_at = timezone.now()
+            report = self._run(base_url, options)
+            report['drain_seconds'] = self._drain(env['ARABICLEXIA_DB_PATH'], options['drain_timeout'])
+            report['analysis_jobs'] = self._job_counts(env['ARABICLEXIA_DB_PATH'])
+            report['config'] = {key: options[key] for key in ('server', 'server_workers', 'concurrency', 'requests', 'upload_ratio', 'seed_fonts')}
+            report['environment'] = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                                     'started_at': started_at.isoformat()}
+        finally:
+            if server:
+                server.terminate()
+                try: server.wait(10)
+                except subprocess.TimeoutExpired: server.kill()
+            if not options['keep_workdir']: shutil.rmtree(workdir, ignore_errors=True)
+        with open(options['output'], 'w', encoding='utf-8') as f: json.dump(report, f, indent=2, ensure_ascii=False)
+        self._print(report, options['output'])
+
+    def _manage(self, env, *args):
+        result = subprocess.run([sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode != 0: raise CommandError(result.stderr)
+
+    def _start_server(self, options, env, port, log_path):
+        if options['server'] == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', '-w', str(options['server_workers'])]
+        else:
+            command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+        with open(log_path, 'w') as log:
+            return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    def _wait_until_ready(self, server, base_url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None: raise CommandError(f"server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(base_url + '/admin/login/', timeout=2): return
+            except OSError: time.sleep(0.3)
+        raise CommandError(f"server did not answer within {timeout}s")
+
+    def _run(self, base_url, options):
+        sessions = threading.local()
+        def client():
+            if not hasattr(sessions, 'client'): sessions.client = AdminClient(base_url, USERNAME, PASSWORD)
+            return sessions.client
+        seed_client = AdminClient(base_url, USERNAME, PASSWORD)
+        for i in range(options['seed_fonts']):
+            try: status, _ = seed_client.upload_font(f'Seed {i}', generate_font(f'LoadTest Seed {i}', seed=i))
+            except FormRejected as e: raise CommandError(f"seed upload failed: {e}")
+            if status != 200: raise CommandError(f"seed upload failed (HTTP {status})")
+        font_ids = sorted(seed_client.font_ids())
+        # تُولَّد الخطوط مسبقاً حتى لا يدخل زمن توليدها في القياس
+        rng = random.Random(0)
+        plan = []
+        for i in range(options['requests']):
+            if rng.random() < options['upload_ratio'] or not font_ids:
+                plan.append(('upload', generate_font(f'LoadTest {i}', seed=1000 + i), f'LoadTest {i}'))
+            else:
+                plan.append(('reanalyze', rng.choice(font_ids), None))
+        recorder = LatencyRecorder()
+        def execute(step):
+            endpoint, payload, name = step
+            if endpoint == 'upload': timed(recorder, 'upload', lambda: client().upload_font(name, payload))
+            else: timed(recorder, 'reanalyze', lambda: client().reanalyze([payload]))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool: list(pool.map(execute, plan))
+        return recorder.report(time.perf_counter() - start)
+
+    def _drain(self, db_path, timeout):
+        """Waits for background deep-tier jobs to finish; returns how long that took, or None on timeout."""
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            with sqlite3.connect(db_path) as db:
+                running = db.execute("SELECT COUNT(*) FROM fonts_analysisjob WHERE status IN ('queued', 'running')").fetchone()[0]
+            if not running: return time.monotonic() - start
+            time.sleep(0.5)
+        return None
+
+    def _job_counts(self, db_path):
+        with sqlite3.connect(db_path) as db:
+            rows = db.execute("SELECT tier, status, COUNT(*) FROM fonts_analysisjob GROUP BY tier, status").fetchall()
+        return {f'{tier}:{status}': count for tier, status, count in rows}
+
+    def _print(self, report, output):
+        self.stdout.write(f"{report['total_requests']} requests in {report['elapsed_seconds']:.2f}s ({report['throughput_rps']:.2f} req/s)")
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(f"  {endpoint}: {stats['requests']} req, {stats['throughput_rps']:.2f} req/s, "
+                              f"p50 {stats['p50_ms']:.0f}ms p95 {stats['p95_ms']:.0f}ms p99 {stats['p99_ms']:.0f}ms, "
+                              f"errors {stats['error_rate']:.1%}")
+        drain = report['drain_seconds']
+        self.stdout.write(f"  background analysis drained in {drain:.2f}s" if drain is not None else "  background analysis did not drain before the timeout")
+        self.stdout.write(f"  analysis jobs: {report['analysis_jobs']}")
+        self.stdout.write(self.style.SUCCESS(f"report written to {output}"))
@@ -1,12 +1,12 @@
 # fonts/metrics/base_dimensions.py
 from .utils import get_glyph_bbox
-def calculate_base_dimensions(analyzer):
+def calculate_base_dimensions(analyzer, outlines=True):
     results = {}; hhea = analyzer.font.get('hhea'); os2 = analyzer.font.get('OS/2')
     ascender = hhea.ascender if hhea else 0
     descender = abs(hhea.descender) if hhea else 0
     cap_height = os2.sCapHeight if os2 and hasattr(os2, 'sCapHeight') and os2.sCapHeight else ascender
     x_height = os2.sxHeight if os2 and hasattr(os2, 'sxHeight') and os2.sxHeight else 0
-    if analyzer.language_support != 'arabic_only':
+    if outlines and analyzer.language_support != 'arabic_only':
         bbox_H = get_glyph_bbox(analyzer.glyph_set, analyzer.cmap.get(ord('H')))
         bbox_x = get_glyph_bbox(analyzer.glyph_set, analyzer.cmap.get(ord('x')))
         if bbox_H: cap_height = bbox_H[3]
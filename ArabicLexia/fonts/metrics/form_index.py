@@ -0,0 +1,140 @@
+# fonts/metrics/form_index.py
+# فهرس الأشكال الموضعية (ابتدائي/وسطي/نهائي/منفرد) لكل محرف عربي، مبني مباشرة من جدول GSUB
+import unicodedata
+from ..glyph_selection import ARABIC_BLOCKS, PRESENTATION_BLOCKS
+
+FORM_FEATURES = {'isolated': 'isol', 'initial': 'init', 'medial': 'medi', 'final': 'fina'}
+DECOMPOSITION_TAGS = {'<isolated>': 'isolated', '<initial>': 'initial', '<medial>': 'medial', '<final>': 'final'}
+
+def _presentation_forms():
+    """Maps each presentation-form codepoint to (base codepoint, form) from its Unicode decomposition."""
+    forms = {}
+    for start, end in PRESENTATION_BLOCKS:
+        for codepoint in range(start, end + 1):
+            parts = unicodedata.decomposition(chr(codepoint)).split()
+            if len(parts) == 2 and parts[0] in DECOMPOSITION_TAGS:
+                forms[codepoint] = (int(parts[1], 16), DECOMPOSITION_TAGS[parts[0]])
+    return forms
+
+PRESENTATION_FORMS = _presentation_forms()
+
+# نوع الاتصال (Joining_Type) من ArabicShaping.txt في يونيكود 14، مقصوراً على الكتل العربية أعلاه؛
+# وحدة unicodedata في بايثون لا توفره
+DUAL_JOINING = [(0x0620, 0x0620), (0x0626, 0x0626), (0x0628, 0x0628), (0x062A, 0x062E), (0x0633, 0x063F), (0x0641, 0x0647),
+                (0x0649, 0x064A), (0x066E, 0x066F), (0x0678, 0x0687), (0x069A, 0x06BF), (0x06C1, 0x06C2), (0x06CC, 0x06CC),
+                (0x06CE, 0x06CE), (0x06D0, 0x06D1), (0x06FA, 0x06FC), (0x06FF, 0x06FF), (0x0750, 0x0758), (0x075C, 0x076A),
+                (0x076D, 0x0770), (0x0772, 0x0772), (0x0775, 0x0777), (0x077A, 0x077F), (0x0886, 0x0886), (0x0889, 0x088D),
+                (0x08A0, 0x08A9), (0x08AF, 0x08B0), (0x08B3, 0x08B8), (0x08BA, 0x08C8)]
+RIGHT_JOINING = [(0x0622, 0x0625), (0x0627, 0x0627), (0x0629, 0x0629), (0x062F, 0x0632), (0x0648, 0x0648), (0x0671, 0x0673),
+                 (0x0675, 0x0677), (0x0688, 0x0699), (0x06C0, 0x06C0), (0x06C3, 0x06CB), (0x06CD, 0x06CD), (0x06CF, 0x06CF),
+                 (0x06D2, 0x06D3), (0x06D5, 0x06D5), (0x06EE, 0x06EF), (0x0759, 0x075B), (0x076B, 0x076C), (0x0771, 0x0771),
+                 (0x0773, 0x0774), (0x0778, 0x0779), (0x0870, 0x0882), (0x088E, 0x088E), (0x08AA, 0x08AC), (0x08AE, 0x08AE),
+                 (0x08B1, 0x08B2), (0x08B9, 0x08B9)]
+
+def is_arabic_letter(codepoint):
+    return any(start <= codepoint <= end for start, end in ARABIC_BLOCKS) and unicodedata.category(chr(codepoint)) == 'Lo'
+
+def _expected_forms():
+    """Forms each Arabic letter takes in shaping: four when dual-joining, isolated and final when right-joining, else isolated."""
+    expected = {cp: {'isolated'} for start, end in ARABIC_BLOCKS for cp in range(start, end + 1) if is_arabic_letter(cp)}
+    for start, end in DUAL_JOINING:
+        for cp in range(start, end + 1): expected[cp] = set(FORM_FEATURES)
+    for start, end in RIGHT_JOINING:
+        for cp in range(start, end + 1): expected[cp] = {'isolated', 'final'}
+    return expected
+
+# الأشكال التي يأخذها كل حرف في التشكيل بحسب نوع اتصاله، وتُستخدم مرجعاً لحساب التغطية
+EXPECTED_FORMS = _expected_forms()
+# ميزات يطبقها مشكّل النص العربي قبل ميزات الأشكال الموضعية، مثل تفكيك الهمزة عن حاملها في ccmp،
+# والميزات المفعّلة افتراضياً بعدها، مثل rlig التي قد تستبدل رسم الشكل المنفرد
+PRE_FORM_FEATURES = ('ccmp', 'locl')
+POST_FORM_FEATURES = ('rlig', 'rclt', 'calt', 'liga', 'clig', 'mset')
+
+def _script_feature_indices(table, script_tag='arab'):
+    """FeatureList indices enabled for the script's default language system (or all of its languages if it has none)."""
+    if not table.ScriptList: return set()
+    for record in table.ScriptList.ScriptRecord:
+        if record.ScriptTag != script_tag: continue
+        script = record.Script
+        lang_systems = [script.DefaultLangSys] if script.DefaultLangSys else [r.LangSys for r in script.LangSysRecord]
+        return {i for lang_sys in lang_systems for i in lang_sys.FeatureIndex}
+    return set()
+
+def _feature_lookups(gsub, tags):
+    """{tag: [lookup, ...]} in LookupList order, for the features enabled under the arab script only."""
+    lookups = {tag: set() for tag in tags}
+    table = gsub.table if gsub else None
+    if not table or not table.FeatureList or not table.LookupList: return {tag: [] for tag in tags}
+    for i in _script_feature_indices(table):
+        record = table.FeatureList.FeatureRecord[i]
+        if record.FeatureTag in lookups: lookups[record.FeatureTag].update(record.Feature.LookupListIndex)
+    return {tag: [table.LookupList.Lookup[i] for i in sorted(indices)] for tag, indices in lookups.items()}
+
+def _lookup_mapping(lookup):
+    """Single (type 1) and multiple (type 2) substitutions as {glyph: (glyph, ...)}, unwrapping extension lookups."""
+    mapping = {}
+    for subtable in lookup.SubTable:
+        lookup_type = lookup.LookupType
+        if lookup_type == 7: lookup_type, subtable = subtable.ExtensionLookupType, subtable.ExtSubTable
+        if lookup_type == 1: source = {g: (s,) for g, s in subtable.mapping.items()}
+        elif lookup_type == 2: source = {g: tuple(s) for g, s in subtable.mapping.items()}
+        else: continue
+        for glyph, substitute in source.items(): mapping.setdefault(glyph, substitute)
+    return mapping
+
+def _apply(mappings, glyphs):
+    """Runs glyphs through the mappings in order; also returns whether any mapping covered one of them."""
+    covered = False
+    for mapping in mappings:
+        covered = covered or any(glyph in mapping for glyph in glyphs)
+        glyphs = tuple(out for glyph in glyphs for out in mapping.get(glyph, (glyph,)))
+    return glyphs, covered
+
+def build_form_index(font, cmap):
+    """Returns {codepoint: {form: (glyph, ...)}} for every Arabic letter in the font, in one pass over GSUB and cmap."""
+    cmap = cmap or {}
+    tags = PRE_FORM_FEATURES + tuple(FORM_FEATURES.values()) + POST_FORM_FEATURES
+    mappings = {tag: [_lookup_mapping(lookup) for lookup in lookups] for tag, lookups in _feature_lookups(font.get('GSUB'), tags).items()}
+    pre_form = [mapping for tag in PRE_FORM_FEATURES for mapping in mappings[tag]]
+    post_form = [mapping for tag in POST_FORM_FEATURES for mapping in mappings[tag]]
+    index = {}
+    for codepoint, glyph_name in cmap.items():
+        if not is_arabic_letter(codepoint): continue
+        decomposed, _ = _apply(pre_form, (glyph_name,))
+        forms = index.setdefault(codepoint, {'isolated': _apply(post_form, _apply(mappings['isol'], decomposed)[0])[0]})
+        for form in ('initial', 'medial', 'final'):
+            # استبدال الرسم بنفسه يعني أن الخط يوفر الشكل صراحةً برسم الحرف المنفرد
+            substituted, covered = _apply(mappings[FORM_FEATURES[form]], decomposed)
+            if covered: forms[form] = _apply(post_form, substituted)[0]
+    # الأشكال المرمّزة مباشرة في كتل أشكال العرض تُحسب للحرف الأساسي إن لم يوفرها GSUB
+    for codepoint, (base, form) in PRESENTATION_FORMS.items():
+        glyph_name = cmap.get(codepoint)
+        if glyph_name and base in index: index[base].setdefault(form, (glyph_name,))
+    return index
+
+def _contextual_glyphs(gsub):
+    """Glyphs that some contextual (type 5/6) lookup enabled under the arab script takes as input."""
+    table = gsub.table if gsub else None
+    if not table or not table.FeatureList or not table.LookupList: return set()
+    lookup_indices = {i for f in _script_feature_indices(table) for i in table.FeatureList.FeatureRecord[f].Feature.LookupListIndex}
+    glyphs = set()
+    for lookup in (table.LookupList.Lookup[i] for i in lookup_indices):
+        for subtable in lookup.SubTable:
+            lookup_type = lookup.LookupType
+            if lookup_type == 7: lookup_type, subtable = subtable.ExtensionLookupType, subtable.ExtSubTable
+            if lookup_type not in (5, 6): continue
+            if subtable.Format in (1, 2): glyphs.update(subtable.Coverage.glyphs)
+            else:
+                for coverage in (subtable.InputCoverage if lookup_type == 6 else subtable.Coverage): glyphs.update(coverage.glyphs)
+    return glyphs
+
+def context_dependent_forms(font, cmap, index):
+    """(codepoint, form) pairs whose glyphs a contextual lookup may still change, so only shaping can resolve them."""
+    contextual = _contextual_glyphs(font.get('GSUB'))
+    if not contextual: return []
+    return [(cp, form) for cp, forms in index.items() for form, glyphs in forms.items()
+            if cmap.get(cp) in contextual or contextual.intersection(glyphs)]
+
+def missing_forms(index):
+    """(codepoint, form) pairs the letter's joining type calls for but the index could not resolve."""
+    return [(cp, form) for cp, forms in index.items() for form in EXPECTED_FORMS.get(cp, ()) if form not in forms]
@@ -1,23 +1,35 @@
 # fonts/metrics/positional_consistency.py
 import uharfbuzz as hb
+from .form_index import EXPECTED_FORMS, context_dependent_forms, missing_forms
 from .utils import calculate_mean, calculate_std_dev
-ARABIC_CHAR_SET = [chr(c) for c in range(0x0621, 0x064A + 1)]
+TATWEEL = "\u0640"
+SHAPING_CONTEXTS = {'isolated': ("{}", 0), 'initial': ("{}" + TATWEEL, 0), 'medial': (TATWEEL + "{}" + TATWEEL, 1), 'final': (TATWEEL + "{}", 1)}
+def _shape_form(font, glyph_order, codepoint, form):
+    # للأشكال التي لا يحسمها الاستبدال المفرد أو المتعدد في GSUB (سياقية أو مركّبة)
+    template, position = SHAPING_CONTEXTS[form]
+    buf = hb.Buffer(); buf.add_str(template.format(chr(codepoint))); buf.guess_segment_properties(); hb.shape(font, buf)
+    # مخرجات HarfBuzz للنص العربي بالترتيب البصري، لذا يُعرف الحرف من رقم عنقوده لا من موضعه
+    glyphs = tuple(glyph_order[info.codepoint] for info in buf.glyph_infos if info.cluster == position)
+    return glyphs or None
 def calculate_positional_consistency(analyzer):
     results = {}
-    widths = {'initial': [], 'medial': [], 'final': [], 'isolated': []}
     try:
-        font_data = analyzer.font.reader.file.read(); analyzer.font.reader.file.seek(0)
-        face = hb.Face(font_data); font = hb.Font(face); font.scale = (face.upem, face.upem); hb.ot_font_set_funcs(font)
-        tatweel = "\u0640"
-        for char in ARABIC_CHAR_SET:
-            iso_buf = hb.Buffer.create(); iso_buf.add_str(char); iso_buf.guess_segment_properties(); hb.shape(font, iso_buf)
-            if iso_buf.glyph_positions: widths['isolated'].append(iso_buf.glyph_positions[0].x_advance)
-            fina_buf = hb.Buffer.create(); fina_buf.add_str(tatweel + char); fina_buf.guess_segment_properties(); hb.shape(font, fina_buf)
-            if len(fina_buf.glyph_positions) > 1: widths['final'].append(fina_buf.glyph_positions[1].x_advance)
-            init_buf = hb.Buffer.create(); init_buf.add_str(char + tatweel); init_buf.guess_segment_properties(); hb.shape(font, init_buf)
-            if init_buf.glyph_positions: widths['initial'].append(init_buf.glyph_positions[0].x_advance)
-            medi_buf = hb.Buffer.create(); medi_buf.add_str(tatweel + char + tatweel); medi_buf.guess_segment_properties(); hb.shape(font, medi_buf)
-            if len(medi_buf.glyph_positions) > 2: widths['medial'].append(medi_buf.glyph_positions[1].x_advance)
+        # نسخة من الفهرس المشترك في ذاكرة الخطوط، فأشكال التشكيل الاحتياطي لا تُضاف إليه
+        index = {codepoint: dict(forms) for codepoint, forms in analyzer.handle.form_index.items()}
+        missing, contextual = missing_forms(index), context_dependent_forms(analyzer.font, analyzer.cmap, index)
+        if missing or contextual:
+            font, glyph_order = analyzer.handle.hb_font, analyzer.font.getGlyphOrder()
+            for codepoint, form in missing:
+                glyphs = _shape_form(font, glyph_order, codepoint, form)
+                if glyphs and glyphs != index[codepoint]['isolated']: index[codepoint][form] = glyphs
+            # الأشكال التي قد تغيرها قاعدة سياقية تُحسم بالتشكيل الفعلي
+            for codepoint, form in contextual:
+                glyphs = _shape_form(font, glyph_order, codepoint, form)
+                if glyphs: index[codepoint][form] = glyphs
+        glyph_runs = {'initial': set(), 'medial': set(), 'final': set(), 'isolated': set()}
+        for forms in index.values():
+            for form, glyphs in forms.items(): glyph_runs[form].add(glyphs)
+        widths = {form: [sum(analyzer.hmtx[g][0] for g in glyphs) for glyphs in runs] for form, runs in glyph_runs.items()}
     except Exception: return {}
     def consistency(arr):
         mean_val = calculate_mean(arr); return calculate_std_dev(arr) / abs(mean_val) if mean_val != 0 else None
@@ -25,4 +37,7 @@ def calculate_positional_consistency(analyzer):
     results['initial_consistency'] = consistency(widths['initial'])
     results['medial_consistency'] = consistency(widths['medial'])
     results['final_consistency'] = consistency(widths['final'])
-    return results
\ No newline at end of file
+    expected = sum(len(EXPECTED_FORMS.get(cp, ())) for cp in index)
+    covered = sum(len(EXPECTED_FORMS.get(cp, set()) & forms.keys()) for cp, forms in index.items())
+    results['positional_form_coverage'] = covered / expected if expected else None
+    return results
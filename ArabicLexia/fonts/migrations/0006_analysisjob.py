@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fonts', '0005_alter_analysisresult_arabic_kerning_quality_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('succeeded', 'نجح'), ('failed', 'فشل')], default='running', max_length=20, verbose_name='الحالة')),
+                ('reason', models.TextField(blank=True, null=True, verbose_name='سبب الفشل')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الانتهاء')),
+                ('font', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='fonts.font', verbose_name='الخط')),
+            ],
+        ),
+    ]
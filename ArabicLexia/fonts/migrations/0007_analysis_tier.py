@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fonts', '0006_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='tier',
+            field=models.CharField(choices=[('quick', 'فحص سريع'), ('deep', 'تحليل كامل')], default='deep', max_length=10, verbose_name='مستوى التحليل'),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='analysis_tier',
+            field=models.CharField(blank=True, choices=[('quick', 'فحص سريع'), ('deep', 'تحليل كامل')], max_length=10, null=True, verbose_name='مستوى التحليل المكتمل'),
+        ),
+    ]
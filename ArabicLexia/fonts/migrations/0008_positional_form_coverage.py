@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fonts', '0007_analysis_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='positional_form_coverage',
+            field=models.FloatField(blank=True, null=True, verbose_name='تغطية الأشكال الموضعية'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fonts', '0008_positional_form_coverage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='glyph_data',
+            field=models.JSONField(blank=True, null=True, verbose_name='بيانات الرسوم'),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='table_hashes',
+            field=models.JSONField(blank=True, null=True, verbose_name='بصمات الجداول'),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='version_diff',
+            field=models.JSONField(blank=True, null=True, verbose_name='الفروق عن الإصدار السابق'),
+        ),
+        migrations.AddField(
+            model_name='font',
+            name='full_font_name',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='الاسم الكامل في ملف الخط'),
+        ),
+        migrations.AddField(
+            model_name='font',
+            name='previous_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='newer_versions', to='fonts.font', verbose_name='الإصدار السابق'),
+        ),
+    ]
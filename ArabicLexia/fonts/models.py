@@ -1,6 +1,8 @@
 # fonts/models.py
 from django.db import models
 
+ANALYSIS_TIER_CHOICES = [('quick', 'فحص سريع'), ('deep', 'تحليل كامل')]
+
 class Font(models.Model):
     # ... (الكود هنا لم يتغير)
     font_name = models.CharField(max_length=100, verbose_name="اسم الخط")
@@ -10,6 +12,8 @@ class Font(models.Model):
     language_support = models.CharField(max_length=20, choices=[('arabic_only', 'عربي فقط'), ('latin_only', 'لاتيني فقط'), ('bilingual', 'ثنائي اللغة')], verbose_name="الدعم اللغوي")
     classification = models.CharField(max_length=30, choices=[('standard', 'خط قياسي'), ('dyslexia-friendly', 'خط مصمم لعسر القراءة')], default='standard', verbose_name="تصنيف الخط")
     upload_date = models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الرفع")
+    full_font_name = models.CharField(max_length=200, blank=True, null=True, verbose_name="الاسم الكامل في ملف الخط")
+    previous_version = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='newer_versions', verbose_name="الإصدار السابق")
 
     def __str__(self):
         return self.font_name
@@ -46,6 +50,7 @@ class AnalysisResult(models.Model):
     medial_consistency = models.FloatField(null=True, blank=True, verbose_name="اتساق الأشكال الوسطية")
     final_consistency = models.FloatField(null=True, blank=True, verbose_name="اتساق الأشكال النهائية")
     isolated_consistency = models.FloatField(null=True, blank=True, verbose_name="اتساق الأشكال المنفردة")
+    positional_form_coverage = models.FloatField(null=True, blank=True, verbose_name="تغطية الأشكال الموضعية")
     arabic_ascender_consistency = models.FloatField(null=True, blank=True, verbose_name="اتساق الصواعد (عربي)")
     arabic_descender_consistency = models.FloatField(null=True, blank=True, verbose_name="اتساق الهوابط (عربي)")
     diacritic_consistency = models.FloatField(null=True, blank=True, verbose_name="اتساق مواضع التشكيل")
@@ -56,6 +61,22 @@ class AnalysisResult(models.Model):
     # -- تم تغيير هذين الحقلين --
     arabic_kerning_quality = models.IntegerField(null=True, blank=True, verbose_name="جودة التقنين (عربي)")
     latin_kerning_quality = models.IntegerField(null=True, blank=True, verbose_name="جودة التقنين (لاتيني)")
+    glyph_data = models.JSONField(null=True, blank=True, verbose_name="بيانات الرسوم")
+    table_hashes = models.JSONField(null=True, blank=True, verbose_name="بصمات الجداول")
+    version_diff = models.JSONField(null=True, blank=True, verbose_name="الفروق عن الإصدار السابق")
+    analysis_tier = models.CharField(max_length=10, choices=ANALYSIS_TIER_CHOICES, null=True, blank=True, verbose_name="مستوى التحليل المكتمل")
     
     def __str__(self):
-        return f"نتائج تحليل {self.font.font_name}"
\ No newline at end of file
+        return f"نتائج تحليل {self.font.font_name}"
+
+class AnalysisJob(models.Model):
+    STATUS_CHOICES = [('queued', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('succeeded', 'نجح'), ('failed', 'فشل')]
+    font = models.ForeignKey(Font, on_delete=models.CASCADE, related_name='analysis_jobs', verbose_name="الخط")
+    tier = models.CharField(max_length=10, choices=ANALYSIS_TIER_CHOICES, default='deep', verbose_name="مستوى التحليل")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name="الحالة")
+    reason = models.TextField(blank=True, null=True, verbose_name="سبب الفشل")
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="وقت البدء")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="وقت الانتهاء")
+
+    def __str__(self):
+        return f"مهمة تحليل {self.font.font_name} ({self.get_status_display()})"
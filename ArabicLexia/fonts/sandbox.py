@@ -0,0 +1,226 @@
+# fonts/sandbox.py
+# تشغيل التحليل في عمليات فرعية معزولة بحدود للوقت والذاكرة، مع إعادة استخدام العمليات بين الخطوط
+import atexit
+import contextlib
+import logging
+import multiprocessing
+import signal
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# وحدات التحليل الثقيلة (fontTools وuharfbuzz وNumPy) تُحمّل مرة واحدة في خادم forkserver وتُشارك بين العمليات
+HEAVY_MODULES = ['fonts.analyzer']
+DEFAULT_LIMITS = {'ENABLED': True, 'WORKERS': 2, 'CPU_SECONDS': 60, 'WALL_SECONDS': 120, 'MEMORY_MB': 1024}
+# MAX_MB=None يجعل ميزانية ذاكرة الخطوط ربع حد ذاكرة العملية، ويبقى الباقي للمكتبات وذروة التحليل نفسه
+DEFAULT_CACHE = {'MAX_ENTRIES': 8, 'MAX_MB': None}
+CACHE_MEMORY_SHARE = 0.25
+
+class AnalysisFailed(Exception):
+    """Raised when a sandboxed analysis is killed or cannot finish; the message is the recorded reason."""
+
+def get_limits():
+    return {**DEFAULT_LIMITS, **getattr(settings, 'FONT_ANALYSIS_SANDBOX', {})}
+
+def deep_workers(workers):
+    # يبقى مكان واحد على الأقل للفحص السريع حتى لا ينتظر خلف التحليلات الكاملة
+    return max(1, workers - 1)
+
+def get_cache_limits():
+    limits = {**DEFAULT_CACHE, **getattr(settings, 'FONT_ANALYSIS_CACHE', {})}
+    memory_mb = get_limits()['MEMORY_MB']
+    budget = memory_mb * CACHE_MEMORY_SHARE if memory_mb else 256
+    if limits['MAX_MB'] is None: limits['MAX_MB'] = budget
+    elif memory_mb and limits['MAX_MB'] > budget:
+        logger.warning("FONT_ANALYSIS_CACHE['MAX_MB'] (%s) does not fit in FONT_ANALYSIS_SANDBOX['MEMORY_MB'] (%s); capping it at %s MB",
+                       limits['MAX_MB'], memory_mb, budget)
+        limits['MAX_MB'] = budget
+    return limits
+
+def _analyze(font_data, font_type, language_support, subset, tier='deep', previous=None):
+    from .analyzer import FontAnalyzer
+    from .font_cache import get_cache
+    cache = get_cache()
+    handle = cache.get(font_data, subset_scope=language_support if subset else None)
+    with handle.lock:
+        analyzer = FontAnalyzer(None, font_type, language_support, handle=handle, previous=previous)
+        if tier == 'quick': return analyzer.quick_scan()
+        result = analyzer.analyze()
+        # أول تحليل كامل يوسّع الرسوم ويبني الفهارس، فيُعاد قياس المقبض بعده مرة واحدة
+        if not handle.settled: cache.resize(handle)
+        return result
+
+def _worker_main(conn, memory_mb, cache_limits):
+    import resource
+    from .font_cache import configure, get_cache
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure(cache_limits['MAX_ENTRIES'], cache_limits['MAX_MB'])
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        try: job = conn.recv()
+        except EOFError: return
+        if job is None: return
+        if job == 'stats':
+            conn.send(('ok', get_cache().stats())); continue
+        cpu_seconds, args = job
+        if cpu_seconds:
+            # RLIMIT_CPU تراكمي طوال عمر العملية، لذا يُحسب الحد نسبةً إلى الاستهلاك الحالي
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+            hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+        try:
+            conn.send(('ok', _analyze(*args)))
+        except MemoryError:
+            conn.send(('error', "تجاوز التحليل حد الذاكرة المسموح"))
+            return
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+def _exit_reason(exitcode):
+    if exitcode == -signal.SIGXCPU or exitcode == -signal.SIGKILL:
+        return "تجاوز التحليل حد زمن المعالج أو أُنهي قسرياً"
+    if exitcode is not None and exitcode < 0:
+        return f"انتهت عملية التحليل بالإشارة {signal.Signals(-exitcode).name}"
+    return f"انتهت عملية التحليل بشكل غير متوقع (رمز الخروج {exitcode})"
+
+class _Worker:
+    def __init__(self, context, memory_mb, cache_limits):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb, cache_limits), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run(self, args, cpu_seconds, wall_seconds):
+        return self._request((cpu_seconds, args), wall_seconds)
+
+    def stats(self):
+        return self._request('stats', 5)
+
+    def _request(self, message, wall_seconds):
+        try:
+            # عملية ماتت بين مهمتين تُسقط الإرسال نفسه بـ BrokenPipeError، فيُعامل كسائر أسباب الفشل
+            self.conn.send(message)
+            if not self.conn.poll(wall_seconds or None):
+                self.kill()
+                raise AnalysisFailed(f"تجاوز التحليل الحد الزمني ({wall_seconds} ثانية)")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join(1)
+            raise AnalysisFailed(_exit_reason(self.process.exitcode))
+        if status != 'ok': raise AnalysisFailed(payload)
+        return payload
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive(): self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+class SandboxPool:
+    """A fixed-size pool of limited analysis processes; dead or timed-out workers are replaced on the next job.
+
+    Deep jobs share a smaller semaphore so that, with two or more workers, one is always left for quick scans.
+    """
+    def __init__(self, workers, cpu_seconds, wall_seconds, memory_mb, cache_limits=None):
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if 'forkserver' in methods: self.context.set_forkserver_preload(HEAVY_MODULES)
+        self.cpu_seconds, self.wall_seconds, self.memory_mb = cpu_seconds, wall_seconds, memory_mb
+        self.cache_limits = cache_limits or get_cache_limits()
+        self.idle = []
+        self.slots = threading.BoundedSemaphore(workers)
+        self.deep_slots = threading.BoundedSemaphore(deep_workers(workers))
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        with self.lock:
+            while self.idle:
+                worker = self.idle.pop()
+                if worker.alive(): return worker
+                worker.kill()
+        return _Worker(self.context, self.memory_mb, self.cache_limits)
+
+    def run(self, font_data, font_type, language_support, subset=False, tier='deep', previous=None):
+        with self.deep_slots if tier == 'deep' else contextlib.nullcontext(), self.slots:
+            worker = self._acquire()
+            try:
+                result = worker.run((font_data, font_type, language_support, subset, tier, previous), self.cpu_seconds, self.wall_seconds)
+            except AnalysisFailed:
+                worker.kill()
+                raise
+            with self.lock: self.idle.append(worker)
+            return result
+
+    def cache_stats(self):
+        """Font cache statistics summed over the idle workers (busy ones are skipped), each queried while out of the idle list."""
+        with self.lock: count = len(self.idle)
+        totals = {'workers': 0, 'entries': 0, 'bytes': 0, 'max_bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+        for _ in range(count):
+            # تُسحب العملية من قائمة الخاملة طوال تبادل الإحصاءات حتى لا يرسل إليها run مهمة على الأنبوب نفسه
+            with self.lock:
+                if not self.idle: break
+                worker = self.idle.pop(0)
+            try: stats = worker.stats()
+            except AnalysisFailed:
+                worker.kill(); continue
+            with self.lock: self.idle.append(worker)
+            totals['workers'] += 1
+            for key in totals.keys() - {'workers'}: totals[key] += stats[key]
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        return totals
+
+    def shutdown(self):
+        with self.lock:
+            for worker in self.idle:
+                try: worker.conn.send(None); worker.process.join(1)
+                except OSError: pass
+                worker.kill()
+            self.idle = []
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            limits = get_limits()
+            _pool = SandboxPool(limits['WORKERS'], limits['CPU_SECONDS'], limits['WALL_SECONDS'], limits['MEMORY_MB'], get_cache_limits())
+            atexit.register(_pool.shutdown)
+        return _pool
+
+def preload():
+    """Imports the analysis stack up front, e.g. in the gunicorn master when analysis runs in the web workers themselves."""
+    import importlib
+    for name in HEAVY_MODULES: importlib.import_module(name)
+
+_local_cache_configured = False
+
+def _configure_local_cache():
+    global _local_cache_configured
+    with _pool_lock:
+        if not _local_cache_configured:
+            from .font_cache import configure
+            limits = get_cache_limits(); configure(limits['MAX_ENTRIES'], limits['MAX_MB'])
+            _local_cache_configured = True
+
+def cache_stats():
+    """Font cache statistics of this process's analysis workers, or of this process itself when the sandbox is off."""
+    if not get_limits()['ENABLED']:
+        from .font_cache import get_cache
+        _configure_local_cache()
+        return {'workers': 1, **get_cache().stats()}
+    return get_pool().cache_stats()
+
+def run_analysis(font_data, font_type, language_support, subset=False, tier='deep', previous=None):
+    if not get_limits()['ENABLED']:
+        _configure_local_cache()
+        return _analyze(font_data, font_type, language_support, subset, tier, previous)
+    return get_pool().run(font_data, font_type, language_support, subset, tier, previous)
@@ -1,3 +1,363 @@
-from django.test import TestCase
+import copy
+import io
+import os
+import shutil
+import signal
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.contrib.admin.sites import site
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from .admin import _fail_interrupted_jobs
+from .analyzer import FontAnalyzer
+from .font_cache import ESTIMATED_SIZE_FACTOR, FontCache, FontHandle
+from .glyph_selection import select_glyphs, subset_font
+from .loadtest import LatencyRecorder, generate_font, percentile
+from .metrics.form_index import EXPECTED_FORMS, build_form_index
+from .metrics.positional_consistency import calculate_positional_consistency
+from .models import AnalysisJob, AnalysisResult, Font
+from .sandbox import AnalysisFailed, SandboxPool, _analyze, get_cache_limits
+from .version_diff import glyph_hashes, summarize
 
-# Create your tests here.
+@override_settings(FONT_ANALYSIS_SANDBOX={'ENABLED': False, 'WALL_SECONDS': 120})
+class AnalysisTierTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root); cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable(); shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.admin = site._registry[Font]
+        self.font = Font.objects.create(font_name='Test', font_type='sans-serif', language_support='bilingual',
+                                        font_file=ContentFile(generate_font('Tier Test', seed=1), name='tier.ttf'))
+        self.font_data = generate_font('Tier Test', seed=1)
+
+    def test_quick_tier_keeps_the_previous_deep_result(self):
+        self.admin._run_tier(self.font, self.font_data, 'deep')
+        deep = AnalysisResult.objects.get(font=self.font)
+        self.assertIsNotNone(deep.positional_form_coverage)
+        self.admin._run_tier(self.font, self.font_data, 'quick')
+        result = AnalysisResult.objects.get(font=self.font)
+        self.assertEqual(result.analysis_tier, 'deep')
+        self.assertEqual(result.positional_form_coverage, deep.positional_form_coverage)
+        self.assertEqual(result.glyph_data, deep.glyph_data)
+        # the quick scan reads cap height from OS/2 (700), the deep tier measures the outlines (510)
+        self.assertEqual(result.cap_height, deep.cap_height)
+
+    def test_deep_tier_starts_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.admin._perform_analysis(None, self.font)
+            self.assertEqual(AnalysisJob.objects.get(font=self.font, tier='deep').status, 'queued')
+        self.assertEqual(len(callbacks), 1)
+
+    def test_superseded_queued_job_is_skipped(self):
+        with self.captureOnCommitCallbacks():
+            self.admin._perform_analysis(None, self.font)
+            self.admin._perform_analysis(None, self.font)
+        first, second = AnalysisJob.objects.filter(font=self.font, tier='deep').order_by('pk')
+        self.assertEqual((first.status, second.status), ('failed', 'queued'))
+        self.admin._run_deep_tier_in_background(self.font, self.font_data, first.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'failed')
+
+    def test_failed_analysis_reason_is_stored_on_the_job(self):
+        with mock.patch('fonts.admin.run_analysis', side_effect=AnalysisFailed("تجاوز التحليل الحد الزمني (120 ثانية)")):
+            with self.assertRaises(AnalysisFailed):
+                self.admin._run_tier(self.font, self.font_data, 'deep')
+        job = AnalysisJob.objects.get(font=self.font, tier='deep')
+        self.assertEqual((job.status, job.reason), ('failed', "تجاوز التحليل الحد الزمني (120 ثانية)"))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_interrupted_running_job_is_marked_failed(self):
+        stale = AnalysisJob.objects.create(font=self.font, tier='deep')
+        stale_queued = AnalysisJob.objects.create(font=self.font, tier='deep', status='queued')
+        AnalysisJob.objects.filter(pk__in=[stale.pk, stale_queued.pk]).update(started_at=timezone.now() - timedelta(seconds=600))
+        fresh = AnalysisJob.objects.create(font=self.font, tier='deep')
+        fresh_queued = AnalysisJob.objects.create(font=self.font, tier='deep', status='queued')
+        _fail_interrupted_jobs()
+        for job in (stale, stale_queued, fresh, fresh_queued): job.refresh_from_db()
+        self.assertEqual((stale.status, stale_queued.status), ('failed', 'failed'))
+        self.assertEqual((fresh.status, fresh_queued.status), ('running', 'queued'))
+
+class SandboxPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.font_data = generate_font('Sandbox Test', seed=3)
+
+    def _pool(self, wall_seconds):
+        pool = SandboxPool(1, 0, wall_seconds, 0)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def _run(self, pool):
+        return pool.run(self.font_data, 'sans-serif', 'bilingual', tier='quick')
+
+    def test_wall_clock_limit_kills_the_worker(self):
+        pool = self._pool(wall_seconds=0.05)
+        worker = pool._acquire()
+        # a stopped worker never answers, so the job can only end through the wall-clock limit
+        os.kill(worker.process.pid, signal.SIGSTOP)
+        pool.idle.append(worker)
+        with self.assertRaisesMessage(AnalysisFailed, "الحد الزمني (0.05 ثانية)"):
+            self._run(pool)
+        self.assertFalse(worker.alive())
+        self.assertEqual(pool.idle, [])
+
+    def test_killed_worker_is_replaced_on_the_next_job(self):
+        pool = self._pool(wall_seconds=60)
+        self.assertEqual(self._run(pool)['full_font_name'], 'Sandbox Test Regular')
+        worker = pool.idle[0]
+        os.kill(worker.process.pid, signal.SIGKILL); worker.process.join(5)
+        self.assertEqual(self._run(pool)['full_font_name'], 'Sandbox Test Regular')
+        self.assertEqual(len(pool.idle), 1)
+        self.assertNotEqual(pool.idle[0].process.pid, worker.process.pid)
+
+class FontCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fonts = [generate_font(f'Cache Test {i}', seed=i) for i in range(3)]
+
+    def test_handle_is_estimated_on_insert_and_measured_after_the_first_deep_run(self):
+        cache = FontCache()
+        with mock.patch('fonts.font_cache._cache', cache):
+            _analyze(self.fonts[0], 'sans-serif', 'bilingual', False, tier='quick')
+            handle = cache.get(self.fonts[0])
+            self.assertEqual(handle.size, len(self.fonts[0]) * ESTIMATED_SIZE_FACTOR)
+            self.assertFalse(handle.settled)
+            _analyze(self.fonts[0], 'sans-serif', 'bilingual', False, tier='deep')
+        self.assertTrue(handle.settled)
+        self.assertNotEqual(handle.size, len(self.fonts[0]) * ESTIMATED_SIZE_FACTOR)
+        self.assertEqual(cache.stats()['bytes'], handle.size)
+
+    def test_evicts_least_recently_used_by_entry_count(self):
+        cache = FontCache(max_entries=2, max_mb=1024)
+        for data in self.fonts: cache.get(data)
+        cache.get(self.fonts[2]); cache.get(self.fonts[0])
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (2, 1, 4))
+        self.assertEqual(stats['evictions'], 2)
+        self.assertEqual(stats['hit_rate'], 0.2)
+
+    def test_evicts_by_memory_but_keeps_the_newest_entry(self):
+        cache = FontCache(max_entries=8, max_mb=0.001)
+        for data in self.fonts: cache.get(data)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (1, 2))
+        self.assertEqual(stats['bytes'], cache.get(self.fonts[2]).size)
+
+    def test_quick_and_deep_tiers_share_one_handle(self):
+        with mock.patch('fonts.font_cache._cache', FontCache()) as cache:
+            _analyze(self.fonts[0], 'sans-serif', 'bilingual', False, tier='quick')
+            _analyze(self.fonts[0], 'sans-serif', 'bilingual', False, tier='deep')
+            stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_pool_stats_take_the_worker_out_of_the_idle_list(self):
+        pool = SandboxPool(1, 0, 0, 0)
+        worker = mock.Mock()
+        def stats():
+            self.assertNotIn(worker, pool.idle)
+            return {'entries': 1, 'bytes': 10, 'max_bytes': 100, 'hits': 3, 'misses': 1, 'evictions': 0}
+        worker.stats.side_effect = stats
+        pool.idle.append(worker)
+        totals = pool.cache_stats()
+        self.assertEqual((totals['workers'], totals['hits'], totals['hit_rate']), (1, 3, 0.75))
+        self.assertEqual(pool.idle, [worker])
+
+    def test_deep_jobs_leave_a_worker_for_quick_scans(self):
+        pool = SandboxPool(2, 0, 0, 0)
+        pool.deep_slots.acquire()
+        worker = mock.Mock(); worker.run.return_value = {}
+        with mock.patch.object(pool, '_acquire', return_value=worker):
+            # the only deep slot is taken, yet a quick scan still gets a worker
+            self.assertEqual(pool.run(b'', 'sans-serif', 'bilingual', tier='quick'), {})
+            self.assertFalse(pool.deep_slots.acquire(blocking=False))
+
+    @override_settings(FONT_ANALYSIS_SANDBOX={'MEMORY_MB': 400})
+    def test_budget_is_derived_from_the_sandbox_memory_limit(self):
+        with override_settings(FONT_ANALYSIS_CACHE={}):
+            self.assertEqual(get_cache_limits()['MAX_MB'], 100)
+        with override_settings(FONT_ANALYSIS_CACHE={'MAX_MB': 500}), self.assertLogs('fonts.sandbox', 'WARNING'):
+            self.assertEqual(get_cache_limits()['MAX_MB'], 100)
+
+class GlyphSelectionTests(SimpleTestCase):
+    cmap = {0x0000: '.notdef', 0x0020: 'space', 0x0041: 'A', 0x0627: 'alef', 0xFE8D: 'alef', 0xFE8E: 'alef.fina'}
+
+    def test_glyph_reached_from_several_codepoints_is_listed_once(self):
+        self.assertEqual(select_glyphs(self.cmap, 'arabic_only'), {'arabic': ['alef', 'alef.fina']})
+
+    def test_notdef_is_excluded(self):
+        self.assertNotIn('.notdef', sum(select_glyphs(self.cmap, 'bilingual').values(), []))
+
+    def test_scripts_follow_language_support(self):
+        self.assertEqual(select_glyphs(self.cmap, 'latin_only'), {'latin': ['space', 'A']})
+        self.assertEqual(select_glyphs(self.cmap, 'bilingual'), {'arabic': ['alef', 'alef.fina'], 'latin': ['space', 'A']})
+
+    def test_arabic_extended_b_letters_are_selected(self):
+        self.assertEqual(select_glyphs({0x0870: 'uni0870'}, 'arabic_only'), {'arabic': ['uni0870']})
+
+    def test_subset_keeps_space_and_notdef(self):
+        from fontTools.ttLib import TTFont
+        font = TTFont(io.BytesIO(generate_font('Subset Test', seed=5)))
+        subset = TTFont(io.BytesIO(subset_font(font, 'arabic_only')))
+        cmap = subset.getBestCmap()
+        self.assertEqual(cmap[0x0020], 'space')
+        self.assertIn(0x0628, cmap)
+        self.assertNotIn(0x0041, cmap)
+        self.assertEqual(subset.getGlyphOrder()[0], '.notdef')
+
+def _font_with_features(features):
+    """A generate_font font whose GSUB is replaced by the given feature file."""
+    from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+    from fontTools.ttLib import TTFont
+    font = TTFont(io.BytesIO(generate_font('Form Test', seed=7)))
+    del font['GSUB']
+    addOpenTypeFeaturesFromString(font, features)
+    buffer = io.BytesIO(); font.save(buffer)
+    return buffer.getvalue()
+
+def _form_index(data):
+    handle = FontHandle.load(data)
+    return build_form_index(handle.font, handle.cmap)
+
+class FormIndexTests(SimpleTestCase):
+    def test_generated_font_forms(self):
+        index = _form_index(generate_font('Form Test', seed=7))
+        self.assertEqual(index[0x0628], {'isolated': ('uni0628',), 'initial': ('uni0628.init',),
+                                         'medial': ('uni0628.medi',), 'final': ('uni0628.fina',)})
+
+    def test_expected_forms_follow_joining_type(self):
+        self.assertEqual(EXPECTED_FORMS[0x0628], {'isolated', 'initial', 'medial', 'final'})
+        self.assertEqual(EXPECTED_FORMS[0x0627], {'isolated', 'final'})
+        self.assertEqual(EXPECTED_FORMS[0x0621], {'isolated'})
+        # Arabic Supplement and Extended-A letters without presentation forms
+        self.assertEqual(EXPECTED_FORMS[0x0750], {'isolated', 'initial', 'medial', 'final'})
+        self.assertEqual(EXPECTED_FORMS[0x08AA], {'isolated', 'final'})
+
+    def test_identity_substitution_provides_the_form(self):
+        index = _form_index(_font_with_features("languagesystem arab dflt;\nfeature fina { sub uni0628 by uni0628; } fina;"))
+        self.assertEqual(index[0x0628]['final'], ('uni0628',))
+        self.assertNotIn('final', index[0x062A])
+
+    def test_only_arab_script_features_are_used(self):
+        index = _form_index(_font_with_features(
+            "languagesystem DFLT dflt;\nlanguagesystem latn dflt;\nlanguagesystem arab dflt;\n"
+            "feature init { script latn; sub uni0628 by uni0628.init; script arab; sub uni062A by uni062A.init; } init;"))
+        self.assertNotIn('initial', index[0x0628])
+        self.assertEqual(index[0x062A]['initial'], ('uni062A.init',))
+
+    def test_forms_are_resolved_after_ccmp(self):
+        index = _form_index(_font_with_features("languagesystem arab dflt;\n"
+                                                "feature ccmp { sub uni0628 by uni062A uni0627; } ccmp;\n"
+                                                "feature init { sub uni062A by uni062A.init; } init;"))
+        self.assertEqual(index[0x0628]['initial'], ('uni062A.init', 'uni0627'))
+        self.assertEqual(index[0x0628]['isolated'], ('uni062A', 'uni0627'))
+
+    def test_shaping_fallback_does_not_change_the_cached_index(self):
+        data = _font_with_features("languagesystem arab dflt;\nlookup BEH_FINA { sub uni0628 by uni0628.fina; } BEH_FINA;\n"
+                                   "feature fina { sub uni0628' lookup BEH_FINA; sub uni062A by uni062A.fina; } fina;")
+        analyzer = FontAnalyzer(data, 'sans-serif', 'bilingual')
+        self.assertNotIn('final', analyzer.handle.form_index[0x0628])
+        cached = copy.deepcopy(analyzer.handle.form_index)
+        results = calculate_positional_consistency(analyzer)
+        self.assertEqual(analyzer.handle.form_index, cached)
+        self.assertIsNotNone(results['final_consistency'])
+
+def _composite_font(height):
+    """A generate_font font plus a composite glyph built from uni0628, whose outline height is given."""
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+    from fontTools.ttLib import TTFont
+    from .loadtest import _box_glyph
+    font = TTFont(io.BytesIO(generate_font('Hash Test', seed=3)))
+    glyf = font['glyf']
+    glyf['uni0628'] = _box_glyph(600, height, 0)
+    pen = TTGlyphPen(font.getGlyphSet()); pen.addComponent('uni0628', (1, 0, 0, 1, 0, 100))
+    glyf['uni0628.above'] = pen.glyph()
+    font['hmtx']['uni0628.above'] = (600, 50)
+    buffer = io.BytesIO(); font.save(buffer)
+    return TTFont(io.BytesIO(buffer.getvalue()))
+
+def _cff_font(subroutinized, height=500):
+    """A one-glyph CFF font; the subroutinized variant moves one segment of the same outline into a global subr."""
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.misc.psCharStrings import T2CharString
+    from fontTools.ttLib import TTFont
+    program = [100, 0, 'rmoveto', 400, 0, 'rlineto', 0, height, 'rlineto', -400, 0, 'rlineto', 'endchar']
+    builder = FontBuilder(1000, isTTF=False)
+    builder.setupGlyphOrder(['.notdef', 'a']); builder.setupCharacterMap({0x61: 'a'})
+    builder.setupCFF('HashTest', {}, {'.notdef': T2CharString(program=['endchar']), 'a': T2CharString(program=program)}, {})
+    builder.setupHorizontalMetrics({'.notdef': (500, 0), 'a': (600, 100)}); builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({'familyName': 'Hash Test', 'styleName': 'Regular'}); builder.setupOS2(); builder.setupPost()
+    if subroutinized:
+        cff = builder.font['CFF '].cff
+        cff.GlobalSubrs.append(T2CharString(program=[0, height, 'rlineto', 'return']))
+        cff.topDictIndex[0].CharStrings['a'].program = [100, 0, 'rmoveto', 400, 0, 'rlineto', -107, 'callgsubr', -400, 0, 'rlineto', 'endchar']
+    buffer = io.BytesIO(); builder.font.save(buffer)
+    return TTFont(io.BytesIO(buffer.getvalue()))
+
+class VersionDiffTests(SimpleTestCase):
+    def test_composite_hash_follows_its_components(self):
+        before, after = glyph_hashes(_composite_font(500), ['uni0628', 'uni0628.above', 'uni062A']), \
+                        glyph_hashes(_composite_font(650), ['uni0628', 'uni0628.above', 'uni062A'])
+        self.assertNotEqual(before['uni0628'], after['uni0628'])
+        self.assertNotEqual(before['uni0628.above'], after['uni0628.above'])
+        self.assertEqual(before['uni062A'], after['uni062A'])
+
+    def test_cff_hash_ignores_subroutinization(self):
+        flat, subroutinized = _cff_font(False), _cff_font(True)
+        self.assertNotEqual(flat.reader['CFF '], subroutinized.reader['CFF '])
+        self.assertEqual(glyph_hashes(flat, ['a']), glyph_hashes(subroutinized, ['a']))
+        self.assertNotEqual(glyph_hashes(flat, ['a']), glyph_hashes(_cff_font(True, height=600), ['a']))
+
+    def test_summarize_counts_changes(self):
+        names = ['uni0628', 'uni0628.above', 'uni062A', 'uni062B']
+        before, after = _composite_font(500), _composite_font(650)
+        previous = {'table_hashes': {'glyf': 'old', 'OS/2': 'same', 'kern': 'gone'},
+                    'glyph_data': {name: {'hash': h} for name, h in glyph_hashes(before, names[:3]).items()}}
+        now = {name: {'hash': h} for name, h in glyph_hashes(after, names[1:]).items()}
+        diff = summarize(previous, {'glyf': 'new', 'OS/2': 'same'}, now, reused=1)
+        self.assertEqual(diff, {'changed_tables': ['glyf', 'kern'], 'added_glyphs': 1, 'removed_glyphs': 1,
+                                'changed_glyphs': 1, 'reused_glyphs': 1})
+
+class FullFontNameTests(SimpleTestCase):
+    def _quick_scan(self, names):
+        from fontTools.ttLib import TTFont
+        font = TTFont(io.BytesIO(generate_font('Name Test', seed=1)))
+        for name_id, value in names.items(): font['name'].setName(value, name_id, 3, 1, 0x409)
+        buffer = io.BytesIO(); font.save(buffer)
+        return FontAnalyzer(buffer.getvalue(), 'sans-serif', 'bilingual').quick_scan()
+
+    def test_prefers_name_id_4(self):
+        self.assertEqual(self._quick_scan({4: 'Name Test Full', 16: 'Typographic'})['full_font_name'], 'Name Test Full')
+
+    def test_falls_back_to_typographic_then_legacy_names(self):
+        self.assertEqual(self._quick_scan({16: 'Name Test Pro', 17: 'Book'})['full_font_name'], 'Name Test Pro Book')
+        self.assertEqual(self._quick_scan({})['full_font_name'], 'Name Test Regular')
+
+class LoadTestReportTests(SimpleTestCase):
+    def test_percentile_uses_the_nearest_rank(self):
+        values = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)), (0.5, 1.0, 1.0))
+        self.assertEqual(percentile([0.2], 0.0), 0.2)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_report_counts_errors_and_throughput_per_endpoint(self):
+        recorder = LatencyRecorder()
+        for seconds, ok in [(0.4, True), (0.1, True), (0.3, False), (0.2, True)]: recorder.record('upload', seconds, ok)
+        recorder.record('reanalyze', 0.05, True)
+        report = recorder.report(elapsed=2.0)
+        self.assertEqual((report['total_requests'], report['throughput_rps']), (5, 2.5))
+        upload = report['endpoints']['upload']
+        self.assertEqual((upload['requests'], upload['errors'], upload['error_rate'], upload['throughput_rps']), (4, 1, 0.25, 2.0))
+        self.assertAlmostEqual(upload['p50_ms'], 200)
+        self.assertAlmostEqual(upload['p99_ms'], 400)
+        self.assertAlmostEqual(upload['max_ms'], 400)
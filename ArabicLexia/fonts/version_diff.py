@@ -0,0 +1,62 @@
+# fonts/version_diff.py
+# بصمات الجداول والرسوم لمقارنة إصدار جديد من الخط بإصداره السابق
+import copy
+import hashlib
+import struct
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def table_hashes(font):
+    reader = font.reader
+    return {tag: _digest(reader[tag]) for tag in sorted(reader.keys())}
+
+def _outline_source(font):
+    """Returns a function giving a glyph's outline data: raw glyf bytes, the desubroutinized CFF program, or a recorded drawing."""
+    if 'glyf' in font:
+        raw, loca, glyph_ids = font.reader['glyf'], font['loca'], font.getReverseGlyphMap()
+        def outline(name):
+            glyph_id = glyph_ids[name]; return raw[loca[glyph_id]:loca[glyph_id + 1]]
+        return outline
+    if 'CFF ' in font:
+        from fontTools.cffLib.transforms import desubroutinizeCharString
+        charstrings = font['CFF '].cff.topDictIndex[0].CharStrings
+        def outline(name):
+            # البايتات المضغوطة باستدعاءات subrs تتغير حين يُعاد توزيع الروتينات الفرعية ولو لم يتغير الرسم،
+            # فيُبصم البرنامج بعد فك الروتينات على نسخة لا تمس الخط المشترك
+            charstring = copy.copy(charstrings[name])
+            desubroutinizeCharString(charstring)
+            return repr(charstring.program).encode()
+        return outline
+    from fontTools.pens.recordingPen import RecordingPen
+    glyph_set = font.getGlyphSet()
+    def outline(name):
+        pen = RecordingPen(); glyph_set[name].draw(pen); return repr(pen.value).encode()
+    return outline
+
+def glyph_hashes(font, glyph_names):
+    """Hashes each glyph's outline data and metrics; composite glyphs also fold in their components' outlines."""
+    outline, hmtx, outlines = _outline_source(font), font['hmtx'], {}
+    glyf = font['glyf'] if 'glyf' in font else None
+    def outline_hash(name):
+        if name in outlines: return outlines[name]
+        outlines[name] = ''  # يمنع الدوران اللانهائي في المكونات المتداخلة المعطوبة
+        data = outline(name)
+        if glyf is not None and data[:2] == b'\xff\xff':
+            data += ''.join(outline_hash(c.glyphName) for c in glyf[name].components).encode()
+        outlines[name] = _digest(data)
+        return outlines[name]
+    return {name: _digest(outline_hash(name).encode() + struct.pack('>Hh', *hmtx[name])) for name in glyph_names}
+
+def summarize(previous, table_hashes_now, glyph_data_now, reused):
+    """Per-table and per-glyph change counts between the previous version's stored data and this analysis."""
+    previous_tables, previous_glyphs = previous.get('table_hashes') or {}, previous.get('glyph_data') or {}
+    tags = previous_tables.keys() | table_hashes_now.keys()
+    return {
+        'changed_tables': sorted(tag for tag in tags if previous_tables.get(tag) != table_hashes_now.get(tag)),
+        'added_glyphs': len(glyph_data_now.keys() - previous_glyphs.keys()),
+        'removed_glyphs': len(previous_glyphs.keys() - glyph_data_now.keys()),
+        'changed_glyphs': sum(1 for name, record in glyph_data_now.items()
+                              if name in previous_glyphs and previous_glyphs[name].get('hash') != record['hash']),
+        'reused_glyphs': reused,
+    }
@@ -0,0 +1,10 @@
+# gunicorn.conf.py
+# تحميل تطبيق Django في العملية الرئيسية قبل تفريع العمليات، فلا يُكرر كل منها الإقلاع
+wsgi_app = "ArabicLexia.wsgi:application"
+preload_app = True
+
+def on_starting(server):
+    # مع العزل المفعّل يجري التحليل في عمليات forkserver التي تحمّل وحداته بنفسها، فلا تحتاجها عمليات الويب؛
+    # وبدونه يُوفّر التحميل المسبق زمن الاستيراد في كل عملية، أما الذاكرة فتُنسخ صفحاتها تدريجياً مع عدادات المراجع
+    from fonts.sandbox import get_limits, preload
+    if not get_limits()['ENABLED']: preload()